@@ -11,7 +11,7 @@ Author: Ben Bargabus
 Date: May 15, 2025
 Version: 1.0.0
 License: CC BY-NC
-Dependencies: kivy
+Dependencies: kivy, aiohttp (only needed for Grok API calls), numpy (used by the default Asteroids game)
 """
 
 """
@@ -70,6 +70,10 @@ iOS app.  Steps:
 
 1) make sure you have all dependencies for kivy-ios in place (e.g. automake, autoconf, see kivy-ios documentation)
 2) clone the latest kivy-ios from GitHub, follow instructions to build python3 and kivy recipes
+2a) build numpy for the default Asteroids game (toolchain build numpy)
+2b) install aiohttp for Grok API calls, kivy-ios has no recipe for it (toolchain pip install aiohttp)
+2c) optionally build the Cython physics module for the default game
+    (toolchain build asteroids_physics --add-custom-recipe /path/to/recipes/asteroids_physics)
 3) use kivy-ios's toolchain to create the Xcode project (toolchain create GenerateGameAIApp /path/to/this/main.py)
 3) open the resulting Xcode project into Xcode
 4) build the project
@@ -80,50 +84,106 @@ from kivy.app import App
 from kivy.uix.boxlayout import BoxLayout
 from kivy.uix.textinput import TextInput
 from kivy.uix.button import Button
-from kivy.network.urlrequest import UrlRequest
+from kivy.clock import Clock
 # Import json for handling API data
 import json
-
-# Define the main application class inheriting from Kivy App
-class GameGeneratorApp(App):
-    # Build the main UI layout
-    def build(self):
-        # Create a vertical BoxLayout with padding and spacing
-        self.layout = BoxLayout(orientation='vertical', padding=10, spacing=10)
-
-        # Create input field for Grok API key
-        self.api_key_input = TextInput(hint_text='Enter your Grok API key', multiline=False, size_hint=(1, 0.1))
-        self.layout.add_widget(self.api_key_input)
-
-        # Create input field for prompt prefix with default Kivy game instructions
-        self.prefix_input = TextInput(hint_text='Prompt prefix (optional)', multiline=True, size_hint=(1, 0.1), text="I want you to write me code in python utilizing Kivy.  This should be constructed as a single file, not relying on multiple python source files or external files such as sprites.  It should contain a Kivy compatible Widget named GeneratedGameWidget.  This will be targeted to run on iPhones and iPads running recent releases of iOS and iPadOS.  It should make use of touch controls with fallbacks for iOS and iPadOS supported game controllers and keyboards.  Pay close attention to coordinate systems and positioning to make sure orientation of various entities within the resulting product behave as intended.  Now, following these instructions produce the following game for me: \n\n")
-        self.layout.add_widget(self.prefix_input)
-
-        # Create input field for prompt suffix
-        self.suffix_input = TextInput(hint_text='Prompt suffix (optional)', multiline=True, size_hint=(1, 0.1), text="\n\nReturn only the generated code as your response, do not include any additional text or information.")
-        self.layout.add_widget(self.suffix_input)
-
-        # Create input field for the game prompt
-        self.prompt_input = TextInput(hint_text='Enter your game prompt', multiline=True, size_hint=(1, 0.3))
-        self.layout.add_widget(self.prompt_input)
-
-        # Create button to generate game code
-        generate_btn = Button(text='Generate Game Code', size_hint=(1, 0.1))
-        generate_btn.bind(on_press=self.generate_code)
-        self.layout.add_widget(generate_btn)
-
-        # Define default Asteroids game code as a string
-        asteroids_code = """from kivy.app import App
+# Import asyncio, aiohttp and threading for streaming API responses off the UI thread
+import asyncio
+import threading
+# aiohttp is only needed to call the API, the app (and the default game) still runs without it
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+# Import stdlib modules used by the local API response cache
+import hashlib
+import os
+import re
+import sqlite3
+import time
+# Import OrderedDict for the compiled code LRU cache and ast for checking code before running it
+from collections import OrderedDict
+import ast
+
+# Cached API responses older than this (in seconds) are ignored, 7 days
+RESPONSE_CACHE_TTL = 7 * 24 * 60 * 60
+# Number of compiled game code objects kept for reuse across Run taps
+CODE_CACHE_SIZE = 8
+
+# Names bound anywhere in a parsed module by definitions, assignments (of any kind) and imports,
+# used only to reject code that can't possibly provide a name, the real check happens after exec
+def bound_names(tree):
+    names = set()
+    for node in ast.walk(tree):
+        if isinstance(node, (ast.ClassDef, ast.FunctionDef, ast.AsyncFunctionDef)):
+            names.add(node.name)
+        elif isinstance(node, ast.Name) and isinstance(node.ctx, ast.Store):
+            names.add(node.id)
+        elif isinstance(node, ast.alias):
+            names.add((node.asname or node.name).split('.')[0])
+    return names
+
+# Local on-disk cache of Grok API responses keyed by a hash of the request parameters
+class ResponseCache:
+    def __init__(self, db_path, ttl=RESPONSE_CACHE_TTL):
+        self.ttl = ttl
+        # Open (or create) the sqlite database and make sure the cache table exists
+        self.conn = sqlite3.connect(db_path)
+        self.conn.execute('CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, content TEXT, ts REAL)')
+        # Second index keyed on normalized prompts so reworded requests can still hit
+        self.conn.execute('CREATE TABLE IF NOT EXISTS normalized_cache (key TEXT PRIMARY KEY, content TEXT, ts REAL)')
+        # Drop expired responses so the database doesn't grow without bound
+        min_ts = time.time() - self.ttl
+        self.conn.execute('DELETE FROM cache WHERE ts <= ?', (min_ts,))
+        self.conn.execute('DELETE FROM normalized_cache WHERE ts <= ?', (min_ts,))
+        self.conn.commit()
+
+    # Build a deterministic key from everything that affects the generated response
+    @staticmethod
+    def make_key(model, messages, temperature, max_tokens):
+        payload = json.dumps({'m': model, 'p': messages, 't': temperature, 'mx': max_tokens}, sort_keys=True)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    # Build a key that ignores case, punctuation, word order and repeated words in the messages
+    @staticmethod
+    def make_normalized_key(model, messages, temperature, max_tokens):
+        normalized = [
+            {'role': message['role'],
+             'content': ' '.join(sorted(set(re.sub(r'\W+', ' ', message['content'].lower()).split())))}
+            for message in messages
+        ]
+        return ResponseCache.make_key(model, normalized, temperature, max_tokens)
+
+    # Return cached content for key, falling back to normalized_key, or None if missing or expired
+    def get(self, key, normalized_key=None):
+        min_ts = time.time() - self.ttl
+        row = self.conn.execute('SELECT content FROM cache WHERE key=? AND ts > ?', (key, min_ts)).fetchone()
+        if row is None and normalized_key is not None:
+            row = self.conn.execute('SELECT content FROM normalized_cache WHERE key=? AND ts > ?',
+                                    (normalized_key, min_ts)).fetchone()
+        return row[0] if row else None
+
+    # Store (or overwrite) the content for key and, if given, normalized_key
+    def put(self, key, content, normalized_key=None):
+        now = time.time()
+        self.conn.execute('INSERT OR REPLACE INTO cache (key, content, ts) VALUES (?, ?, ?)', (key, content, now))
+        if normalized_key is not None:
+            self.conn.execute('INSERT OR REPLACE INTO normalized_cache (key, content, ts) VALUES (?, ?, ?)',
+                              (normalized_key, content, now))
+        self.conn.commit()
+
+# Define default Asteroids game code as a string
+ASTEROIDS_CODE = """from kivy.app import App
 from kivy.uix.widget import Widget
 from kivy.uix.label import Label
 from kivy.properties import NumericProperty, ReferenceListProperty, ObjectProperty, StringProperty
 from kivy.vector import Vector
 from kivy.clock import Clock
 from kivy.core.window import Window
-from kivy.graphics import Color, Ellipse, Triangle, PushMatrix, PopMatrix, Rotate
+from kivy.graphics import Color, Ellipse, Triangle, PushMatrix, PopMatrix, Rotate, Translate
 from kivy.utils import platform
-from random import randint, uniform
 import math
+import numpy as np
 
 try:
     from pyobjus import autoclass
@@ -131,12 +191,142 @@ try:
     GCGamepad = autoclass('GCGamepad')
     GCExtendedGamepad = autoclass('GCExtendedGamepad')
 except ImportError:
+    autoclass = None
     GCController = None
     GCGamepad = None
     GCExtendedGamepad = None
 
+# Resolve UIDevice once rather than on every controller check
+UIDevice = None
+if platform == 'ios' and autoclass:
+    try:
+        UIDevice = autoclass('UIDevice')
+    except Exception as e:
+        print(f"Error loading UIDevice: {e}")
+
 Window.size = (800, 600)
 
+# Pool of pre-drawn uniform [0, 1) floats, refilled in one vectorized draw when used up,
+# so spawning and splitting don't pay per-call RNG overhead
+RNG_POOL_SIZE = 4096
+_rng = np.random.default_rng()
+_pool = _rng.random(RNG_POOL_SIZE).tolist()
+_idx = 0
+
+def _random():
+    global _pool, _idx
+    if _idx == RNG_POOL_SIZE:
+        _pool = _rng.random(RNG_POOL_SIZE).tolist()
+        _idx = 0
+    value = _pool[_idx]
+    _idx += 1
+    return value
+
+# Same semantics as random.uniform / random.randint (inclusive), served from the pool
+def uniform(a, b):
+    return a + (b - a) * _random()
+
+def randint(a, b):
+    return a + int(_random() * (b - a + 1))
+
+# Above this many bullet/asteroid pairs, collisions are found with a spatial grid instead of all pairs
+GRID_PAIR_THRESHOLD = 1024
+
+# Overlapping (bullet, asteroid) index pairs found by bucketing asteroid centers into a uniform grid
+# and testing each live bullet only against its own and the 8 neighbouring cells
+def grid_hits(bul_c, bul_r, ast_c, ast_r, bul_alive):
+    # Cells at least as large as the biggest bullet + asteroid radius, so no overlap is missed
+    cell = float(ast_r.max() + bul_r.max())
+    ast_list = ast_c.tolist()
+    ast_r_list = ast_r.tolist()
+    cells = {}
+    for a, (x, y) in enumerate(ast_list):
+        cells.setdefault((int(x // cell), int(y // cell)), []).append(a)
+    hits = []
+    for b, ((x, y), r, alive) in enumerate(zip(bul_c.tolist(), bul_r.tolist(), bul_alive.tolist())):
+        if not alive:
+            continue
+        cx = int(x // cell)
+        cy = int(y // cell)
+        for gx in (cx - 1, cx, cx + 1):
+            for gy in (cy - 1, cy, cy + 1):
+                for a in cells.get((gx, gy), ()):
+                    ax, ay = ast_list[a]
+                    dx = x - ax
+                    dy = y - ay
+                    reach = r + ast_r_list[a]
+                    if dx * dx + dy * dy < reach * reach:
+                        hits.append((b, a))
+    hits.sort()
+    return hits
+
+# Preallocated widget counts; pools double in size if a game ever needs more at once
+BULLET_POOL_SIZE = 64
+ASTEROID_POOL_SIZE = 32
+
+# Set of reusable widgets kept in the parent's widget tree, free ones are hidden (opacity 0)
+# so spawning and despawning avoid add_widget/remove_widget and canvas rebuilds
+class WidgetPool:
+    def __init__(self, parent, factory, size):
+        self.parent = parent
+        self.factory = factory
+        self.widgets = []
+        self.in_use = np.zeros(0, dtype=np.bool_)
+        self.grow(size)
+
+    def grow(self, count):
+        for _ in range(count):
+            widget = self.factory()
+            widget.opacity = 0
+            widget.pool_index = len(self.widgets)
+            self.widgets.append(widget)
+            self.parent.add_widget(widget)
+        self.in_use = np.concatenate((self.in_use, np.zeros(count, dtype=np.bool_)))
+
+    def acquire(self):
+        free = np.flatnonzero(~self.in_use)
+        if not len(free):
+            free = [len(self.widgets)]
+            self.grow(len(self.widgets))
+        index = int(free[0])
+        self.in_use[index] = True
+        widget = self.widgets[index]
+        widget.opacity = 1
+        return widget
+
+    def release(self, widget):
+        self.in_use[widget.pool_index] = False
+        widget.opacity = 0
+
+# Fixed simulation step, and the most frame time simulated at once so a long stall can't snowball
+PHYSICS_DT = 1.0 / 60.0
+MAX_FRAME_TIME = 0.25
+
+# Initial capacity of the per-frame entity arrays used for movement and collisions (grown on demand)
+MAX_ENTITIES = 64
+
+# Prefer the Cython build of step_entities shipped with production builds (recipes/asteroids_physics),
+# then the Numba build next to main.py (asteroids_physics_jit, compiled once per process on import)
+try:
+    from asteroids_physics import step_entities
+except ImportError:
+    try:
+        from asteroids_physics_jit import step_entities
+    except ImportError:
+        step_entities = None
+
+# Advance every entity by its velocity and optionally wrap it around the screen edges
+if step_entities is None:
+    def step_entities(xy, vel, w, h, wrap):
+        xy += vel
+        if wrap:
+            for col, limit in ((0, w), (1, h)):
+                v = xy[:, col]
+                low = v < 0
+                high = v > limit
+                v[low] = limit
+                v[high] = 0
+
 class Spaceship(Widget):
     velocity_x = NumericProperty(0)
     velocity_y = NumericProperty(0)
@@ -148,109 +338,114 @@ class Spaceship(Widget):
         self.size = (40, 40)
         with self.canvas:
             PushMatrix()
-            self.rotation = Rotate(angle=self.angle, origin=self.center)
+            self.translate = Translate(*self.center)
+            self.rotation = Rotate(angle=self.angle - 90)
             Color(1, 1, 1, 1)
             self.triangle = Triangle(points=[0, 0, 0, 0, 0, 0])
             PopMatrix()
-        self.bind(pos=self.update_graphics, size=self.update_graphics, angle=self.update_graphics)
+        # Direction cosines of the current heading, recomputed only when the angle changes
+        self._on_angle_changed()
+        self.update_shape()
+        self.bind(angle=self._on_angle_changed)
+        self.bind(pos=self.update_graphics, angle=self.update_graphics)
+        self.bind(size=self.update_shape)
+
+    def _on_angle_changed(self, *args):
+        angle_rad = math.radians(self.angle)
+        self._cos_a = math.cos(angle_rad)
+        self._sin_a = math.sin(angle_rad)
 
-    def update_graphics(self, *args):
-        center_x, center_y = self.center
-        self.rotation.angle = self.angle - 90  # 0° points up
-        self.rotation.origin = self.center
+    def update_shape(self, *args):
+        # Triangle in local coordinates around the ship center, placed by Translate and Rotate
         self.triangle.points = [
-            center_x, center_y + self.height * 0.6,           # Nose (forward)
-            center_x - self.width * 0.5, center_y - self.height * 0.4,  # Left rear
-            center_x + self.width * 0.5, center_y - self.height * 0.4   # Right rear
+            0, self.height * 0.6,                       # Nose (forward)
+            -self.width * 0.5, -self.height * 0.4,      # Left rear
+            self.width * 0.5, -self.height * 0.4        # Right rear
         ]
+        self.update_graphics()
+
+    def update_graphics(self, *args):
+        self.translate.xy = self.center
+        self.rotation.angle = self.angle - 90  # 0° points up
 
     def move(self):
-        self.pos = Vector(*self.velocity) + self.pos
-        if self.x < 0:
-            self.x = Window.width
-        if self.x > Window.width:
-            self.x = 0
-        if self.y < 0:
-            self.y = Window.height
-        if self.y > Window.height:
-            self.y = 0
+        x = self.x + self.velocity_x
+        y = self.y + self.velocity_y
+        if x < 0:
+            x = Window.width
+        elif x > Window.width:
+            x = 0
+        if y < 0:
+            y = Window.height
+        elif y > Window.height:
+            y = 0
+        self.pos = (x, y)
 
     def rotate(self, direction):
         self.angle += direction * 5
 
     def thrust(self):
-        angle_rad = math.radians(self.angle)
-        thrust_vector = Vector(math.cos(angle_rad), math.sin(angle_rad)) * 0.2
-        self.velocity = Vector(*self.velocity) + thrust_vector
+        self.velocity = (self.velocity_x + self._cos_a * 0.2, self.velocity_y + self._sin_a * 0.2)
 
     def shoot(self, parent):
-        bullet = Bullet()
-        angle_rad = math.radians(self.angle)
-        nose_x = self.center_x + math.cos(angle_rad) * self.height * 0.6
-        nose_y = self.center_y + math.sin(angle_rad) * self.height * 0.6
+        bullet = parent.bullet_pool.acquire()
+        bullet.reset()
+        nose_x = self.center_x + self._cos_a * self.height * 0.6
+        nose_y = self.center_y + self._sin_a * self.height * 0.6
         bullet.pos = (nose_x - bullet.size[0]/2, nose_y - bullet.size[1]/2)
-        bullet.velocity = Vector(math.cos(angle_rad), math.sin(angle_rad)) * 25
-        parent.add_widget(bullet)
+        bullet.velocity = (self._cos_a * 25, self._sin_a * 25)
         parent.bullets.append(bullet)
 
 class Bullet(Widget):
     velocity_x = NumericProperty(0)
     velocity_y = NumericProperty(0)
     velocity = ReferenceListProperty(velocity_x, velocity_y)
-    lifetime = NumericProperty(10.0)
 
     def __init__(self, **kwargs):
         super(Bullet, self).__init__(**kwargs)
+        self.reset()
         self.size = (5, 5)
         with self.canvas:
             Color(1, 1, 1, 1)
             self.ellipse = Ellipse(pos=self.pos, size=self.size)
         self.bind(pos=self.update_graphics)
 
+    def reset(self):
+        # Plain attribute, nothing binds to it so a Kivy property would only add dispatch overhead
+        self.lifetime = 10.0
+
     def update_graphics(self, *args):
         self.ellipse.pos = self.pos
 
-    def move(self):
-        self.pos = Vector(*self.velocity) + self.pos
-
 class Asteroid(Widget):
     velocity_x = NumericProperty(0)
     velocity_y = NumericProperty(0)
     velocity = ReferenceListProperty(velocity_x, velocity_y)
-    size_level = NumericProperty(3)  # 3=large, 2=medium, 1=small
 
     def __init__(self, size_level=3, **kwargs):
         super(Asteroid, self).__init__(**kwargs)
-        self.size_level = size_level
-        self.size = (40 * size_level, 40 * size_level)
+        self.reset(size_level)
         with self.canvas:
             Color(0.5, 0.5, 0.5, 1)
             self.ellipse = Ellipse(pos=self.pos, size=self.size)
-        self.bind(pos=self.update_graphics)
+        self.bind(pos=self.update_graphics, size=self.update_graphics)
+
+    def reset(self, size_level):
+        self.size_level = size_level  # 3=large, 2=medium, 1=small
+        self.size = (40 * size_level, 40 * size_level)
 
     def update_graphics(self, *args):
         self.ellipse.pos = self.pos
         self.ellipse.size = self.size
 
-    def move(self):
-        self.pos = Vector(*self.velocity) + self.pos
-        if self.x < 0:
-            self.x = Window.width
-        if self.x > Window.width:
-            self.x = 0
-        if self.y < 0:
-            self.y = Window.height
-        if self.y > Window.height:
-            self.y = 0
-
     def split(self, parent):
         if self.size_level > 1:
             for _ in range(2):
-                new_asteroid = Asteroid(size_level=self.size_level - 1)
+                new_asteroid = parent.asteroid_pool.acquire()
+                new_asteroid.reset(self.size_level - 1)
                 new_asteroid.pos = (self.x + randint(-10, 10), self.y + randint(-10, 10))
                 new_asteroid.velocity = Vector(uniform(-2, 2), uniform(-2, 2))
                 parent.asteroids.append(new_asteroid)
-                parent.add_widget(new_asteroid)
 
 class FireButton(Widget):
     def __init__(self, **kwargs):
@@ -260,15 +455,22 @@ class FireButton(Widget):
         with self.canvas:
             Color(1, 0, 0, 0.5)
             self.ellipse = Ellipse(pos=self.pos, size=self.size)
+        self._update_radius()
         self.bind(pos=self.update_graphics)
+        self.bind(size=self._update_radius)
+
+    def _update_radius(self, *args):
+        # Squared radius so touch tests can skip the sqrt
+        self._r2 = (self.width / 2) ** 2
 
     def update_graphics(self, *args):
         self.ellipse.pos = self.pos
 
     def collide_point(self, x, y):
         cx, cy = self.center
-        radius = self.width / 2
-        return math.sqrt((x - cx)**2 + (y - cy)**2) <= radius
+        dx = x - cx
+        dy = y - cy
+        return dx * dx + dy * dy <= self._r2
 
 class GeneratedGameWidget(Widget):
     spaceship = ObjectProperty(None)
@@ -280,6 +482,14 @@ class GeneratedGameWidget(Widget):
         super(GeneratedGameWidget, self).__init__(**kwargs)
         self.asteroids = []
         self.bullets = []
+        # Structure-of-arrays mirrors of entity positions, velocities and radii, refreshed
+        # each frame so movement and collisions run as single native/vectorized passes
+        self._ast_xy = np.zeros((MAX_ENTITIES, 2))
+        self._ast_vel = np.zeros((MAX_ENTITIES, 2))
+        self._ast_r = np.zeros(MAX_ENTITIES)
+        self._bul_xy = np.zeros((MAX_ENTITIES, 2))
+        self._bul_vel = np.zeros((MAX_ENTITIES, 2))
+        self._bul_r = np.zeros(MAX_ENTITIES)
         self.spaceship = Spaceship()
         self.spaceship.center = self.center
         self.add_widget(self.spaceship)
@@ -293,6 +503,11 @@ class GeneratedGameWidget(Widget):
         self.add_widget(self.lives_label)
         self.add_widget(self.game_over_label)
         self.add_widget(self.fire_button)
+        # Bullets and asteroids are reused from pools, added after the HUD so they draw on top
+        self.bullet_pool = WidgetPool(self, Bullet, BULLET_POOL_SIZE)
+        self.asteroid_pool = WidgetPool(self, Asteroid, ASTEROID_POOL_SIZE)
+        # Only re-layout the label text when the value actually changes
+        self.bind(score=self.update_score_label, lives=self.update_lives_label)
 
         self._keyboard = Window.request_keyboard(self._keyboard_closed, self)
         self._keyboard.bind(on_key_down=self._onKeyboardDown)
@@ -300,6 +515,8 @@ class GeneratedGameWidget(Widget):
         self.keys_pressed = set()
         self.touch_pos = None
         self.controllers = []
+        # (x axis, button A, button X) input elements of each connected gamepad, resolved once
+        self._gp_cache = []
         self.touch_ids = []
         self.fire_touch_id = None
 
@@ -311,7 +528,15 @@ class GeneratedGameWidget(Widget):
             if controllers and controllers.count() > 0:
                 self.check_controllers()
 
-        Clock.schedule_interval(self.update, 1.0 / 60.0)
+        # Run once per displayed frame, physics is stepped at a fixed rate inside update()
+        self._acc = None
+        Clock.schedule_interval(self.update, 0)
+
+    def update_score_label(self, *args):
+        self.score_label.text = f'Score: {self.score}'
+
+    def update_lives_label(self, *args):
+        self.lives_label.text = f'Lives: {self.lives}'
 
     def _keyboard_closed(self):
         self._keyboard.unbind(on_key_down=self._onKeyboardDown)
@@ -361,10 +586,9 @@ class GeneratedGameWidget(Widget):
         ignore_gamepad_input = False
 
         # Check the platform using kivy.utils.platform
-        if platform == 'ios' and autoclass:
+        if platform == 'ios' and UIDevice:
             try:
                 # Use pyobjus to check if running in the iOS simulator
-                UIDevice = autoclass('UIDevice')
                 current_device = UIDevice.currentDevice()
                 model = current_device.model  # e.g., "iPhone Simulator" or "iPhone"
                 if 'Simulator' in model:
@@ -385,10 +609,12 @@ class GeneratedGameWidget(Widget):
         if GCController and not ignore_gamepad_input:
             controllers = GCController.controllers()
             self.controllers = [controllers.objectAtIndex_(i) for i in range(controllers.count())]
+            self._gp_cache = []
             for controller in self.controllers:
                 gamepad = controller.extendedGamepad or controller.gamepad
                 if gamepad:
                     gamepad.valueChangedHandler = self.handle_gamepad_input
+                    self._gp_cache.append((gamepad.dpad.xAxis, gamepad.buttonA, gamepad.buttonX))
         else:
             # Handle other platforms if needed
             pass
@@ -419,11 +645,24 @@ class GeneratedGameWidget(Widget):
         else:  # Left
             pos = (-50, randint(0, Window.height))
             velocity = Vector(uniform(1, 3), uniform(-2, 2))
-        asteroid = Asteroid(size_level=3)
+        asteroid = self.asteroid_pool.acquire()
+        asteroid.reset(3)
         asteroid.pos = pos
         asteroid.velocity = velocity
         self.asteroids.append(asteroid)
-        self.add_widget(asteroid)
+
+    def reserve_arrays(self, n_asteroids, n_bullets):
+        # Grow the entity arrays when there are more entities than rows
+        if n_asteroids > len(self._ast_r):
+            size = max(n_asteroids, 2 * len(self._ast_r))
+            self._ast_xy = np.zeros((size, 2))
+            self._ast_vel = np.zeros((size, 2))
+            self._ast_r = np.zeros(size)
+        if n_bullets > len(self._bul_r):
+            size = max(n_bullets, 2 * len(self._bul_r))
+            self._bul_xy = np.zeros((size, 2))
+            self._bul_vel = np.zeros((size, 2))
+            self._bul_r = np.zeros(size)
 
     def reset_game(self):
         self.score = 0
@@ -436,31 +675,39 @@ class GeneratedGameWidget(Widget):
         self.spaceship = Spaceship()
         self.spaceship.center = self.center
         self.add_widget(self.spaceship)
-        for asteroid in self.asteroids[:]:
-            self.remove_widget(asteroid)
-        self.asteroids.clear()
-        for bullet in self.bullets[:]:
-            self.remove_widget(bullet)
-        self.bullets.clear()
+        for asteroid in self.asteroids:
+            self.asteroid_pool.release(asteroid)
+        self.asteroids = []
+        for bullet in self.bullets:
+            self.bullet_pool.release(bullet)
+        self.bullets = []
         self.game_over_label.opacity = 0
 
     def update(self, dt):
+        # The first dt also covers building (and compiling) the game, so don't simulate it
+        if self._acc is None:
+            self._acc = 0.0
+            return
+        self._acc = min(self._acc + dt, MAX_FRAME_TIME)
+        while self._acc >= PHYSICS_DT:
+            self.step_physics(PHYSICS_DT)
+            self._acc -= PHYSICS_DT
+
+    def step_physics(self, dt):
         if self.game_state != 'playing':
             return
 
         if self.controllers:
-            for controller in self.controllers:
-                gamepad = controller.extendedGamepad or controller.gamepad
-                if gamepad:
-                    x_value = gamepad.dpad.xAxis.value
-                    if x_value > 0.5:
-                        self.spaceship.rotate(-1)
-                    elif x_value < -0.5:
-                        self.spaceship.rotate(1)
-                    if gamepad.buttonA.isPressed:
-                        self.spaceship.thrust()
-                    if gamepad.buttonX.isPressed:
-                        self.spaceship.shoot(self)
+            for x_axis, button_a, button_x in self._gp_cache:
+                x_value = x_axis.value
+                if x_value > 0.5:
+                    self.spaceship.rotate(-1)
+                elif x_value < -0.5:
+                    self.spaceship.rotate(1)
+                if button_a.isPressed:
+                    self.spaceship.thrust()
+                if button_x.isPressed:
+                    self.spaceship.shoot(self)
         elif self.touch_pos:
             touch_x, touch_y = self.touch_pos
             ship_x, ship_y = self.spaceship.center
@@ -475,45 +722,86 @@ class GeneratedGameWidget(Widget):
             if 'up' in self.keys_pressed:
                 self.spaceship.thrust()
 
-        self.spaceship.move()
-        for asteroid in self.asteroids:
-            asteroid.move()
-        for bullet in self.bullets[:]:
-            bullet.move()
+        # Copy entity positions, velocities and radii into the arrays; alive masks collect
+        # expired and destroyed entities so the lists are compacted once at the end of the frame
+        asteroids = self.asteroids
+        bullets = self.bullets
+        n_ast = len(asteroids)
+        n_bul = len(bullets)
+        self.reserve_arrays(n_ast, n_bul)
+        ast_xy = self._ast_xy[:n_ast]
+        ast_vel = self._ast_vel[:n_ast]
+        ast_r = self._ast_r[:n_ast]
+        bul_xy = self._bul_xy[:n_bul]
+        bul_vel = self._bul_vel[:n_bul]
+        bul_r = self._bul_r[:n_bul]
+        ast_alive = np.ones(n_ast, dtype=bool)
+        bul_alive = np.ones(n_bul, dtype=bool)
+        for i, asteroid in enumerate(asteroids):
+            ast_xy[i] = asteroid.pos
+            ast_vel[i] = asteroid.velocity
+            ast_r[i] = asteroid.width / 2
+        for i, bullet in enumerate(bullets):
+            bul_xy[i] = bullet.pos
+            bul_vel[i] = bullet.velocity
+            bul_r[i] = bullet.width / 2
             bullet.lifetime -= dt
             if bullet.lifetime <= 0:
-                self.remove_widget(bullet)
-                self.bullets.remove(bullet)
-
-        for asteroid in self.asteroids[:]:
-            if self.spaceship.collide_widget(asteroid):
-                self.lives -= 1
-                self.remove_widget(asteroid)
-                self.asteroids.remove(asteroid)
-                if self.lives > 0:
-                    self.remove_widget(self.spaceship)
-                    self.spaceship = Spaceship()
-                    self.spaceship.center = self.center
-                    self.add_widget(self.spaceship)
-                else:
-                    self.game_state = 'game_over'
-                    self.game_over_label.opacity = 1
-            for bullet in self.bullets[:]:
-                if bullet.collide_widget(asteroid):
-                    self.score += 100 * (4 - asteroid.size_level)
-                    asteroid.split(self)
-                    self.remove_widget(asteroid)
-                    self.remove_widget(bullet)
-                    self.asteroids.remove(asteroid)
-                    self.bullets.remove(bullet)
-                    break
+                bul_alive[i] = False
+
+        # Move everything in one call per entity type; asteroids wrap, bullets fly off screen
+        self.spaceship.move()
+        w, h = float(Window.width), float(Window.height)
+        step_entities(ast_xy, ast_vel, w, h, True)
+        step_entities(bul_xy, bul_vel, w, h, False)
+        for asteroid, pos in zip(asteroids, ast_xy.tolist()):
+            asteroid.pos = pos
+        for bullet, pos in zip(bullets, bul_xy.tolist()):
+            bullet.pos = pos
+
+        # Circle overlap tests on centers: ship against every asteroid, then every bullet/asteroid pair
+        ast_c = ast_xy + ast_r[:, None]
+        bul_c = bul_xy + bul_r[:, None]
+        ship_d2 = np.sum((ast_c - self.spaceship.center) ** 2, axis=1)
+        ship_hits = np.flatnonzero(ship_d2 < (ast_r + self.spaceship.width / 2) ** 2)
+        if n_bul * n_ast > GRID_PAIR_THRESHOLD:
+            hits = grid_hits(bul_c, bul_r, ast_c, ast_r, bul_alive)
+        else:
+            pair_d2 = np.sum((bul_c[:, None] - ast_c[None, :]) ** 2, axis=2)
+            hits = np.argwhere((pair_d2 < (bul_r[:, None] + ast_r[None, :]) ** 2) & bul_alive[:, None]).tolist()
+
+        # Only the colliding pairs are handled in Python
+        if len(ship_hits):
+            self.lives -= 1
+            ast_alive[ship_hits[0]] = False
+            if self.lives > 0:
+                self.remove_widget(self.spaceship)
+                self.spaceship = Spaceship()
+                self.spaceship.center = self.center
+                self.add_widget(self.spaceship)
+            else:
+                self.game_state = 'game_over'
+                self.game_over_label.opacity = 1
+        for b, a in hits:
+            if not (bul_alive[b] and ast_alive[a]):
+                continue
+            asteroid = asteroids[a]
+            self.score += 100 * (4 - asteroid.size_level)
+            asteroid.split(self)
+            ast_alive[a] = False
+            bul_alive[b] = False
+
+        # Drop dead entities in a single pass, keeping fragments appended by split()
+        for a in np.flatnonzero(~ast_alive).tolist():
+            self.asteroid_pool.release(asteroids[a])
+        for b in np.flatnonzero(~bul_alive).tolist():
+            self.bullet_pool.release(bullets[b])
+        self.asteroids = [asteroid for asteroid, ok in zip(asteroids, ast_alive.tolist()) if ok] + asteroids[n_ast:]
+        self.bullets = [bullet for bullet, ok in zip(bullets, bul_alive.tolist()) if ok] + bullets[n_bul:]
 
         if randint(1, 100) < 2 and len(self.asteroids) < 5:
             self.spawn_asteroid()
 
-        self.score_label.text = f'Score: {self.score}'
-        self.lives_label.text = f'Lives: {self.lives}'
-
 class AsteroidsApp(App):
     def build(self):
         return GeneratedGameWidget()
@@ -522,9 +810,59 @@ if __name__ == '__main__':
     AsteroidsApp().run()
 """
 
+# Compile the default game once at import so running it never pays for parsing (the first run in a
+# process still pays for importing the game's dependencies, e.g. numpy and the Numba kernel)
+_DEFAULT_CODE = compile(ASTEROIDS_CODE, '<embedded>', 'exec', optimize=2)
+
+# Define the main application class inheriting from Kivy App
+class GameGeneratorApp(App):
+    # Build the main UI layout
+    def build(self):
+        # Create a vertical BoxLayout with padding and spacing
+        self.layout = BoxLayout(orientation='vertical', padding=10, spacing=10)
+
+        # Open the local API response cache in the app's writable data directory
+        self._response_cache = ResponseCache(os.path.join(self.user_data_dir, 'grokcache.db'))
+        # LRU cache of compiled game code keyed by source text so repeated runs skip parsing
+        self._code_cache = OrderedDict()
+        # Cancel flag and future of the API response currently being streamed, if any
+        self._stream_cancel = None
+        self._stream_future = None
+
+        # Background asyncio loop for API requests, the HTTP session is created on it lazily and
+        # kept alive across requests so connections (and TLS sessions) are reused
+        self._loop = asyncio.new_event_loop()
+        threading.Thread(target=self._loop.run_forever, daemon=True).start()
+        self._http_session = None
+
+        # Create input field for Grok API key
+        self.api_key_input = TextInput(hint_text='Enter your Grok API key', multiline=False, size_hint=(1, 0.1))
+        self.layout.add_widget(self.api_key_input)
+
+        # Create input field for prompt prefix with default Kivy game instructions
+        self.prefix_input = TextInput(hint_text='Prompt prefix (optional)', multiline=True, size_hint=(1, 0.1), text="I want you to write me code in python utilizing Kivy.  This should be constructed as a single file, not relying on multiple python source files or external files such as sprites.  It should contain a Kivy compatible Widget named GeneratedGameWidget.  This will be targeted to run on iPhones and iPads running recent releases of iOS and iPadOS.  It should make use of touch controls with fallbacks for iOS and iPadOS supported game controllers and keyboards.  Pay close attention to coordinate systems and positioning to make sure orientation of various entities within the resulting product behave as intended.  Now, following these instructions produce the following game for me: \n\n")
+        self.layout.add_widget(self.prefix_input)
+        # Keep a canonical (stripped) copy of the prefix so it is sent byte-identical on every call,
+        # letting the provider's prompt cache reuse the processed instructions
+        self._canonical_prefix = self.prefix_input.text.strip()
+        self.prefix_input.bind(text=self.on_prefix_text)
+
+        # Create input field for prompt suffix
+        self.suffix_input = TextInput(hint_text='Prompt suffix (optional)', multiline=True, size_hint=(1, 0.1), text="\n\nReturn only the generated code as your response, do not include any additional text or information.")
+        self.layout.add_widget(self.suffix_input)
+
+        # Create input field for the game prompt
+        self.prompt_input = TextInput(hint_text='Enter your game prompt', multiline=True, size_hint=(1, 0.3))
+        self.layout.add_widget(self.prompt_input)
+
+        # Create button to generate game code
+        generate_btn = Button(text='Generate Game Code', size_hint=(1, 0.1))
+        generate_btn.bind(on_press=self.generate_code)
+        self.layout.add_widget(generate_btn)
+
         # Initialize TextInput for displaying generated code
         self.code_display = TextInput(
-            text=asteroids_code,
+            text=ASTEROIDS_CODE,
             hint_text='Generated code will appear here',
             multiline=True,
             readonly=False,
@@ -543,6 +881,9 @@ if __name__ == '__main__':
 
     # Handle the generation of game code
     def generate_code(self, instance):
+        # Stop any previous response first so its tokens can't land on top of what we show next
+        self.cancel_stream()
+
         # Get and validate API key
         api_key = self.api_key_input.text.strip()
         if not api_key:
@@ -556,16 +897,28 @@ if __name__ == '__main__':
             return
 
         # Get prefix and suffix for the prompt
-        prefix = self.prefix_input.text.strip()
+        prefix = self._canonical_prefix
         suffix = self.suffix_input.text.strip()
-        # Combine prompt components
-        full_prompt = f"{prefix} {prompt} {suffix}".strip()
 
-        # Call the Grok API with the full prompt
-        self.call_grok_api(full_prompt, api_key)
+        # Call the Grok API with the prompt components
+        self.call_grok_api(prefix, prompt, suffix, api_key)
+
+    # Update the canonical prefix only when the user actually edits it
+    def on_prefix_text(self, instance, value):
+        self._canonical_prefix = value.strip()
+
+    # Stop any response still streaming so its tokens don't mix into newer output
+    def cancel_stream(self):
+        if self._stream_cancel is not None:
+            self._stream_cancel.set()
+            self._stream_future.cancel()
+            self._stream_cancel = None
+            self._stream_future = None
 
     # Make API call to Grok for code generation
-    def call_grok_api(self, full_prompt, api_key):
+    def call_grok_api(self, prefix, prompt, suffix, api_key):
+        self.cancel_stream()
+
         # Define API endpoint
         api_url = 'https://api.x.ai/v1/chat/completions'
         # Set headers with API key and content type
@@ -573,45 +926,128 @@ if __name__ == '__main__':
             'Authorization': f'Bearer {api_key}',
             'Content-Type': 'application/json'
         }
-        # Prepare request data
+        # Request parameters, also used to build the response cache key
+        model = 'grok-3'  # Specify the model, e.g., 'grok-3'
+        max_tokens = 16000  # Optional: adjust as needed
+        temperature = 0.7  # Optional: adjust as needed
+
+        # Static instructions go first as a system message so the provider can cache them,
+        # followed by the game idea and the short response-format suffix
+        messages = []
+        if prefix:
+            messages.append({'role': 'system', 'content': prefix})
+        messages.append({'role': 'user', 'content': prompt})
+        if suffix:
+            messages.append({'role': 'user', 'content': suffix})
+
+        # Return a cached response for an identical request without calling the API
+        # Falls back to a normalized form of the prompt so minor rewording still hits
+        cache_key = ResponseCache.make_key(model, messages, temperature, max_tokens)
+        normalized_key = ResponseCache.make_normalized_key(model, messages, temperature, max_tokens)
+        cached = self._response_cache.get(cache_key, normalized_key)
+        if cached is not None:
+            self.code_display.text = cached
+            return
+
+        if aiohttp is None:
+            self.code_display.text = 'Error: aiohttp is required to call the Grok API'
+            return
+
+        # Prepare request data, asking for the response to be streamed as server-sent events
         data = json.dumps({
-            'model': 'grok-3',  # Specify the model, e.g., 'grok-3'
-            'messages': [
-                {'role': 'user', 'content': full_prompt}
-            ],
-            'max_tokens': 16000,  # Optional: adjust as needed
-            'temperature': 0.7  # Optional: adjust as needed
-        })
-
-        # Handle successful API response
-        def on_success(req, result):
-            try:
-                # Extract generated code from response
-                content = result['choices'][0]['message']['content']
-                self.code_display.text = content
-            except (KeyError, IndexError, TypeError):
-                # Handle parsing errors
-                self.code_display.text = 'Error: Unable to parse API response'
-
-        # Handle failed API request
-        def on_failure(req, result):
-            self.code_display.text = 'Error: API request failed\n\nreq: {req}\n\nresult: {result}'
-
-        # Handle network or other errors
-        def on_error(req, error):
-            self.code_display.text = f'Error: {str(error)}'
-
-        # Send POST request to Grok API
-        UrlRequest(
-            api_url,
-            on_success=on_success,
-            on_failure=on_failure,
-            on_error=on_error,
-            req_body=data,
-            req_headers=headers,
-            method='POST'
+            'model': model,
+            'messages': messages,
+            'max_tokens': max_tokens,
+            'temperature': temperature,
+            'stream': True
+        }).encode('utf-8')
+
+        cancel = threading.Event()
+        self._stream_cancel = cancel
+
+        # Clear the display, streamed tokens are appended as they arrive
+        self.code_display.text = ''
+
+        # Append a streamed chunk of generated code at the end, wherever the user left the cursor
+        def on_delta(delta):
+            if not cancel.is_set():
+                self.code_display.cancel_selection()
+                self.code_display.cursor = self.code_display.get_cursor_from_index(len(self.code_display.text))
+                self.code_display.insert_text(delta)
+
+        # Cache the complete response so an identical request doesn't hit the API again
+        def on_done(content):
+            if not cancel.is_set() and content:
+                self._response_cache.put(cache_key, content, normalized_key)
+
+        # Handle failed requests, network or parsing errors, keeping any code streamed so far
+        def on_error(message):
+            if not cancel.is_set():
+                if self.code_display.text:
+                    message = f'{self.code_display.text}\n\n{message}'
+                self.code_display.text = message
+
+        # Send POST request to Grok API on the background event loop
+        self._stream_future = asyncio.run_coroutine_threadsafe(
+            self.stream_grok_response(api_url, data, headers, cancel, on_delta, on_done, on_error),
+            self._loop
         )
 
+    # Read the streamed API response, runs on the background loop and hands results back via Clock
+    async def stream_grok_response(self, api_url, data, headers, cancel, on_delta, on_done, on_error):
+        if self._http_session is None:
+            # No overall limit since long generations can stream for many minutes, only limit
+            # connecting and the gap between received chunks
+            timeout = aiohttp.ClientTimeout(total=None, sock_connect=30, sock_read=120)
+            self._http_session = aiohttp.ClientSession(timeout=timeout)
+        parts = []
+        done = False
+        try:
+            async with self._http_session.post(api_url, data=data, headers=headers) as response:
+                if response.status >= 400:
+                    body = await response.text(errors='replace')
+                    message = f'Error: API request failed\n\nstatus: {response.status}\n\nresult: {body}'
+                    Clock.schedule_once(lambda dt: on_error(message))
+                    return
+                async for raw_line in response.content:
+                    if cancel.is_set():
+                        return
+                    # Each event is a 'data: {json}' line, the stream ends with 'data: [DONE]'
+                    line = raw_line.decode('utf-8').strip()
+                    if not line.startswith('data:'):
+                        continue
+                    payload = line[len('data:'):].strip()
+                    if payload == '[DONE]':
+                        done = True
+                        break
+                    choices = json.loads(payload).get('choices')
+                    if not choices:
+                        continue
+                    delta = choices[0]['delta'].get('content')
+                    if delta:
+                        parts.append(delta)
+                        Clock.schedule_once(lambda dt, delta=delta: on_delta(delta))
+        except (KeyError, IndexError, TypeError, ValueError):
+            Clock.schedule_once(lambda dt: on_error('Error: Unable to parse API response'))
+            return
+        except Exception as e:
+            # Some exceptions (e.g. TimeoutError) have no message, so always include the type
+            message = f'Error: {type(e).__name__}: {e}' if str(e) else f'Error: {type(e).__name__}'
+            Clock.schedule_once(lambda dt: on_error(message))
+            return
+        # A stream that closes without [DONE] is truncated, so don't report (and cache) it as complete
+        if not done:
+            Clock.schedule_once(lambda dt: on_error('Error: API response ended before it was complete'))
+            return
+        content = ''.join(parts)
+        Clock.schedule_once(lambda dt: on_done(content))
+
+    # Close the shared HTTP session and stop the background loop when the app exits
+    def on_stop(self):
+        if self._http_session is not None:
+            asyncio.run_coroutine_threadsafe(self._http_session.close(), self._loop).result(timeout=5)
+        self._loop.call_soon_threadsafe(self._loop.stop)
+
     # Execute the generated game code
     def run_game(self, instance):
         # Get the generated code
@@ -623,8 +1059,26 @@ if __name__ == '__main__':
         try:
             # Create a namespace for code execution
             namespace = {}
+            # Use the precompiled default game, otherwise reuse the compiled code object
+            # if this exact source was run before
+            if generated_code == ASTEROIDS_CODE:
+                code_obj = _DEFAULT_CODE
+            elif generated_code in self._code_cache:
+                code_obj = self._code_cache[generated_code]
+                self._code_cache.move_to_end(generated_code)
+            else:
+                # Parse once and skip compiling/executing code that can't provide the game widget
+                tree = ast.parse(generated_code, '<generated>')
+                if 'GeneratedGameWidget' not in bound_names(tree):
+                    self.code_display.text = 'Error: Generated code does not define GeneratedGameWidget'
+                    return
+                # Compile from the already-built AST rather than re-parsing the source
+                code_obj = compile(tree, '<generated>', 'exec', optimize=2)
+                self._code_cache[generated_code] = code_obj
+                if len(self._code_cache) > CODE_CACHE_SIZE:
+                    self._code_cache.popitem(last=False)
             # Execute the generated code
-            exec(generated_code, namespace)
+            exec(code_obj, namespace)
             # Check if GeneratedGameWidget is defined
             if 'GeneratedGameWidget' in namespace:
                 # Instantiate and display the game widget
@@ -0,0 +1,20 @@
+"""
+kivy-ios recipe for asteroids_physics, a Cython build of the default Asteroids game's entity
+physics kernel.  Build with:
+    toolchain build asteroids_physics --add-custom-recipe /path/to/recipes/asteroids_physics
+The embedded game imports it when present and falls back to Numba/NumPy otherwise.
+"""
+from kivy_ios.toolchain import CythonRecipe
+
+
+class AsteroidsPhysicsRecipe(CythonRecipe):
+    version = "1.0.0"
+    url = "src"
+    library = "libasteroids_physics.a"
+    depends = ["python"]
+
+    def install(self):
+        self.install_python_package(name=self.so_filename("asteroids_physics"), is_dir=False)
+
+
+recipe = AsteroidsPhysicsRecipe()
@@ -0,0 +1,23 @@
+# cython: language_level=3, boundscheck=False, wraparound=False
+"""
+Module: asteroids_physics
+Description: Typed Cython version of step_entities() from the default Asteroids game embedded
+  in main.py.  Same signature and behavior, used in place of the Numba/NumPy versions when the
+  compiled module is available.
+"""
+
+# Advance every entity by its velocity and optionally wrap it around the screen edges
+def step_entities(double[:, ::1] xy, double[:, ::1] vel, double w, double h, bint wrap):
+    cdef Py_ssize_t i
+    for i in range(xy.shape[0]):
+        xy[i, 0] += vel[i, 0]
+        xy[i, 1] += vel[i, 1]
+        if wrap:
+            if xy[i, 0] < 0:
+                xy[i, 0] = w
+            elif xy[i, 0] > w:
+                xy[i, 0] = 0
+            if xy[i, 1] < 0:
+                xy[i, 1] = h
+            elif xy[i, 1] > h:
+                xy[i, 1] = 0
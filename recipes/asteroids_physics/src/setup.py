@@ -0,0 +1,7 @@
+from setuptools import setup, Extension
+
+setup(
+    name='asteroids_physics',
+    version='1.0.0',
+    ext_modules=[Extension('asteroids_physics', ['asteroids_physics.c'])]
+)